@@ -15,6 +15,7 @@ from __future__ import absolute_import, division, print_function
 import pandas as pd
 import numpy as np
 import copy
+import weakref
 
 from SyntheticControlMethods.optimize import Optimize
 from SyntheticControlMethods.plot import Plot
@@ -22,15 +23,48 @@ from SyntheticControlMethods.tables import Tables
 from SyntheticControlMethods.validity_tests import ValidityTests
 
 
+def _demean_sorted(values, unit_starts):
+    '''
+    Subtracts the unitwise mean of each column, ignoring missing values, in place
+
+    values: (n_observations x n_columns) float array, with the rows of each unit stored contiguously
+    unit_starts: sorted array with the index of the first row of each unit
+    '''
+    observed = ~np.isnan(values)
+    sums = np.add.reduceat(np.where(observed, values, 0), unit_starts, axis=0)
+    counts = np.add.reduceat(observed, unit_starts, axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = sums / counts
+
+    #Broadcast each unit's means back to all of its rows
+    unit_lengths = np.diff(np.append(unit_starts, len(values)))
+    values -= np.repeat(means, unit_lengths, axis=0)
+    return values
+
+
+class SynthMatrices(object):
+    '''
+    Compact container for the matrices read in every iteration of the optimization,
+    named as in Abadie, Diamond, Hainmueller
+    '''
+    __slots__ = ('Z1', 'Z0', 'X1', 'X0')
+
+    def __init__(self, Z1, Z0, X1, X0):
+        self.Z1 = Z1 #treated_outcome
+        self.Z0 = Z0 #control_outcome
+        self.X1 = X1 #treated_covariates
+        self.X0 = X0 #control_covariates
+
+
 class SynthBase(object):
     '''Class that stores all variables and results'''
     
-    def __init__(self, dataset, outcome_var, id_var, time_var, treatment_period, treated_unit, control_units,
+    def __init__(self, dataset, outcome_var, id_var, time_var, treatment_period, treated_unit, treated_row, units, times, control_units,
                 covariates, periods_all, periods_pre_treatment, n_controls, n_covariates,
                 treated_outcome, control_outcome, treated_covariates, control_covariates, 
                 unscaled_treated_covariates, unscaled_control_covariates,
                 treated_outcome_all, control_outcome_all, pairwise_difference, pen, random_seed=0,
-                w=None, v=None, **kwargs):
+                dtype=np.float64, w=None, v=None, **kwargs):
 
         '''
         INPUT VARIABLES:
@@ -42,6 +76,7 @@ class SynthBase(object):
         The dataset should be sorted on ID then Time. 
         That is, all observations for one unit in order of Time, 
         followed by all observations by the next unit also sorted on time
+        Only a weak reference to dataset is kept, see the dataset property.
         
         ID: a string containing a unique identifier for the unit associated with the observation.
         E.g. in the simulated datasets provided, the ID of the treated unit is "A".
@@ -51,12 +86,16 @@ class SynthBase(object):
         treated_unit: ID of the treated unit
         '''
 
-        self.dataset = dataset
+        #None for fits made without the dataset, e.g. by fit_placebos
+        self._dataset_ref = weakref.ref(dataset) if dataset is not None else None
         self.outcome_var = outcome_var
         self.id = id_var
         self.time = time_var
         self.treatment_period = treatment_period
         self.treated_unit = treated_unit
+        self.treated_row = treated_row #Index of treated_unit in units
+        self.units = units #All unit IDs, in order of appearance
+        self.times = times #All time periods, sorted
         self.control_units = control_units
         self.covariates = covariates
         self.periods_all = periods_all
@@ -65,6 +104,7 @@ class SynthBase(object):
         self.n_covariates = n_covariates
         self.pen = pen
         self.rng = np.random.default_rng(random_seed)
+        self.dtype = dtype
 
         
         '''
@@ -105,14 +145,15 @@ class SynthBase(object):
         Referred to as V in Abadie, Diamond, Hainmueller.
         '''
         ###Post processing quantities
-        self.treated_outcome = treated_outcome
-        self.control_outcome = control_outcome
-        self.treated_covariates = treated_covariates
-        self.control_covariates = control_covariates
+        #Stored as contiguous arrays of the chosen dtype so matrix products in the optimization need no hidden copies
+        self.matrices = SynthMatrices(np.ascontiguousarray(treated_outcome, dtype=dtype),
+                                      np.ascontiguousarray(control_outcome, dtype=dtype),
+                                      np.ascontiguousarray(treated_covariates, dtype=dtype),
+                                      np.ascontiguousarray(control_covariates, dtype=dtype))
         self.unscaled_treated_covariates = unscaled_treated_covariates
         self.unscaled_control_covariates = unscaled_control_covariates
-        self.treated_outcome_all = treated_outcome_all
-        self.control_outcome_all = control_outcome_all
+        self.treated_outcome_all = np.ascontiguousarray(treated_outcome_all, dtype=dtype)
+        self.control_outcome_all = np.ascontiguousarray(control_outcome_all, dtype=dtype)
         self.pairwise_difference = pairwise_difference
 
         ###Post inference quantities
@@ -138,6 +179,57 @@ class SynthBase(object):
         self.placebo_treatment_period = None
         self.placebo_periods_pre_treatment = None
 
+    @property
+    def dataset(self):
+        '''
+        The dataset the matrices were built from.
+        Only available while the caller still holds a reference to it, so that fitted
+        objects, e.g. from placebo studies, do not keep large dataframes alive.
+        '''
+        dataset = self._dataset_ref() if self._dataset_ref is not None else None
+        if dataset is None:
+            raise ReferenceError("The dataset is no longer available, only a weak reference to it is kept")
+        return dataset
+
+    def __getstate__(self):
+        #Weak references cannot be pickled, so the dataset is not available after unpickling
+        state = self.__dict__.copy()
+        state['_dataset_ref'] = None
+        return state
+
+    #Matrices used in optimization are kept in self.matrices, exposed under their descriptive names
+    @property
+    def treated_outcome(self):
+        return self.matrices.Z1
+
+    @treated_outcome.setter
+    def treated_outcome(self, value):
+        self.matrices.Z1 = value
+
+    @property
+    def control_outcome(self):
+        return self.matrices.Z0
+
+    @control_outcome.setter
+    def control_outcome(self, value):
+        self.matrices.Z0 = value
+
+    @property
+    def treated_covariates(self):
+        return self.matrices.X1
+
+    @treated_covariates.setter
+    def treated_covariates(self, value):
+        self.matrices.X1 = value
+
+    @property
+    def control_covariates(self):
+        return self.matrices.X0
+
+    @control_covariates.setter
+    def control_covariates(self, value):
+        self.matrices.X0 = value
+
 class DataProcessor(object):
     '''Class that processes input data into variables and matrices needed for optimization'''
     
@@ -145,37 +237,57 @@ class DataProcessor(object):
                             outcome_var, id_var, time_var, 
                             treatment_period, treated_unit, 
                             pen, exclude_columns, random_seed,
-                            **kwargs):
+                            dtype=np.float64, **kwargs):
         '''
         Extracts processed variables, excluding v and w, from input variables.
         These are all the data matrices.
         '''
-        #All columns not y, id or time must be predictors
-        covariates = [col for col in dataset.columns if col not in [id_var, time_var] and col not in exclude_columns]
+        covariates = self._get_covariates(dataset, id_var, time_var, exclude_columns)
+
+        #Reshape dataset into the matrices that do not depend on which unit is treated
+        panel = self._build_panel(dataset, outcome_var, id_var, time_var, covariates, dtype)
+
+        processed = self._process_panel(panel, covariates, outcome_var, id_var, time_var,
+                                        treatment_period, treated_unit, pen, random_seed, dtype)
+        processed['dataset'] = dataset
+        return processed
+
+    def _process_panel(self, panel, covariates,
+                       outcome_var, id_var, time_var,
+                       treatment_period, treated_unit,
+                       pen, random_seed, dtype=np.float64):
+        '''
+        Extracts processed variables, excluding v and w, from the output of _build_panel.
+        Needs no dataset, so placebo fits in worker processes are run from the panel alone.
+        '''
+        units, times, outcome, covariate_values = panel
+        if covariate_values.shape[2] != len(covariates) or outcome.dtype != np.dtype(dtype):
+            raise ValueError("panel was built for other covariates or another dtype")
 
         #Extract quantities needed for pre-processing matrices
         #Get number of periods in pre-treatment and total
-        periods_all = dataset[time_var].nunique()
-        periods_pre_treatment = dataset.loc[dataset[time_var]<treatment_period][time_var].nunique()
+        periods_all = len(times)
+        #pandas searchsorted coerces treatment_period, e.g. a date string against a datetime time column
+        periods_pre_treatment = int(pd.Index(times).searchsorted(treatment_period))
         #Number of control units, -1 to remove treated unit
-        n_controls = dataset[id_var].nunique() - 1
+        n_controls = len(units) - 1
         n_covariates = len(covariates)
 
-        #All units that are not the treated unit are controls
-        control_units = dataset.loc[dataset[id_var] != treated_unit][id_var].unique()
+        #Row of the treated unit in the panel, all other units are controls
+        treated_rows = np.flatnonzero(units == treated_unit)
+        if len(treated_rows) == 0:
+            raise ValueError("treated_unit {!r} not found in column {!r}".format(treated_unit, id_var))
+        treated_row = treated_rows[0]
+        control_units = np.delete(units, treated_row)
 
-        ###Get treated unit matrices first###
-        treated_outcome_all, treated_outcome, unscaled_treated_covariates = self._process_treated_data(
-            dataset, outcome_var, id_var, time_var, 
-            treatment_period, treated_unit, periods_all, 
-            periods_pre_treatment, covariates, n_covariates
+        ###Get outcome matrices for treated and control units###
+        treated_outcome_all, treated_outcome, control_outcome_all, control_outcome = self._process_outcome_data(
+            outcome, treated_row, periods_pre_treatment
         )
 
-        ### Now for control unit matrices ###
-        control_outcome_all, control_outcome, unscaled_control_covariates = self._process_control_data(
-            dataset, outcome_var, id_var, time_var, 
-            treatment_period, treated_unit, n_controls, 
-            periods_all, periods_pre_treatment, covariates
+        ###Get covariate matrices for treated and control units###
+        unscaled_treated_covariates, unscaled_control_covariates = self._process_covariate_data(
+            covariate_values, treated_row, periods_pre_treatment
         )
         
         #Rescale covariates to be unit variance (helps with optimization)
@@ -188,12 +300,15 @@ class DataProcessor(object):
                                                                    control_covariates)
 
         return {
-            'dataset': dataset,
+            'dataset': None,
             'outcome_var':outcome_var,
             'id_var':id_var,
             'time_var':time_var,
             'treatment_period':treatment_period,
             'treated_unit':treated_unit,
+            'treated_row':treated_row,
+            'units':units,
+            'times':times,
             'control_units':control_units,
             'covariates':covariates,
             'periods_all':periods_all,
@@ -211,50 +326,104 @@ class DataProcessor(object):
             'pairwise_difference':pairwise_difference,
             'pen':pen,
             'random_seed':random_seed,
+            'dtype':dtype,
         }
     
-    def _process_treated_data(self, dataset, outcome_var, id_var, time_var, treatment_period, treated_unit, 
-                            periods_all, periods_pre_treatment, covariates, n_covariates):
+    @staticmethod
+    def _get_covariates(dataset, id_var, time_var, exclude_columns):
+        '''All columns not id, time or explicitly excluded must be predictors'''
+        excluded_columns = {id_var, time_var}.union(exclude_columns)
+        return [col for col in dataset.columns if col not in excluded_columns]
+
+    @staticmethod
+    def _build_panel(dataset, outcome_var, id_var, time_var, covariates, dtype=np.float64):
         '''
-        Extracts and formats outcome and covariate matrices for the treated unit
+        Reshapes dataset into the quantities that do not depend on which unit is treated:
+
+        units: array of unit IDs, in the order they appear in the dataset
+        times: sorted array of time periods
+        outcome: (n_units x n_periods) matrix of outcomes
+        covariate_values: (n_units x n_periods x n_covariates) array of covariates
+
+        Fits that share a dataset, e.g. placebo studies that only change the treated unit,
+        can build this once and pass it to _process_panel.
         '''
+        #The reshapes below rely on rows being sorted on ID then Time
+        panel_data = DataProcessor._sort_panel(dataset, id_var, time_var)
 
-        treated_data_all = dataset.loc[dataset[id_var] == treated_unit]
-        treated_outcome_all = np.array(treated_data_all[outcome_var]).reshape(periods_all,1) #All outcomes
-        
-        #Only pre-treatment
-        treated_data = treated_data_all.loc[dataset[time_var] < treatment_period]
-        #Extract outcome and shape as matrix
-        treated_outcome = np.array(treated_data[outcome_var]).reshape(periods_pre_treatment, 1)
-        #Columnwise mean of each covariate in pre-treatment period for treated unit, shape as matrix
-        treated_covariates = np.array(treated_data[covariates].mean(axis=0)).reshape(n_covariates, 1)
-
-        return treated_outcome_all, treated_outcome, treated_covariates
-    
+        #Sorted time periods and units in order of appearance, each from a single pass over the column
+        times = np.sort(panel_data[time_var].unique())
+        units = panel_data[id_var].unique()
+        periods_all = len(times)
+
+        #The reshapes need exactly one row per unit and time period, so each unit's rows must hold all times in order
+        time_values = panel_data[time_var].to_numpy()
+        if len(time_values) != len(units) * periods_all or np.any(time_values.reshape(len(units), periods_all) != times):
+            raise ValueError("dataset must have exactly one row for each unit and time period, "
+                             "found duplicate or missing ({}, {}) rows".format(id_var, time_var))
+
+        #As the dataset is sorted on ID then Time, the outcome is reshaped directly to (n_units x n_periods)
+        outcome = panel_data[outcome_var].to_numpy(dtype=dtype, copy=False).reshape(len(units), periods_all)
 
-    def _process_control_data(self, dataset, outcome_var, id_var, time_var, treatment_period, treated_unit, n_controls, 
-                            periods_all, periods_pre_treatment, covariates):
+        #Likewise, covariates are reshaped to (n_units x n_periods x n_covariates)
+        covariate_values = panel_data[covariates].to_numpy(dtype=dtype, copy=False)
+        covariate_values = covariate_values.reshape(len(units), periods_all, len(covariates))
+
+        return units, times, outcome, covariate_values
+
+    @staticmethod
+    def _sort_panel(dataset, id_var, time_var):
+        '''
+        Returns dataset sorted on ID then Time, with units kept in the order they first appear.
+        A dataset that is already sorted, as documented, is returned as is without copying.
         '''
-        Extracts and formats outcome and covariate matrices for the control group
+        #Unit codes are numbered in order of first appearance,
+        #so the dataset is sorted iff codes never decrease and times strictly increase within a unit
+        codes = pd.factorize(dataset[id_var])[0]
+        times = dataset[time_var].to_numpy()
+        new_unit = codes[1:] > codes[:-1]
+        same_unit = codes[1:] == codes[:-1]
+        if np.all(new_unit | (same_unit & (times[1:] > times[:-1]))):
+            return dataset
+
+        #Otherwise sort once, stable so that ties keep their original order
+        return dataset.iloc[np.lexsort((times, codes))]
+
+    def _process_outcome_data(self, outcome, treated_row, periods_pre_treatment):
         '''
+        Extracts and formats outcome matrices for the treated unit and the control group
+        from the (n_units x n_periods) outcome matrix returned by _build_panel
+        '''
+        #Treated unit, all outcomes and only pre-treatment
+        #Copied, so that a panel shared between fits is never modified through the result
+        treated_outcome_all = outcome[treated_row:treated_row+1].T.copy()
+        treated_outcome = treated_outcome_all[:periods_pre_treatment]
 
         #Every unit that is not the treated unit is control
-        control_data_all = dataset.loc[dataset[id_var] != treated_unit]
-        control_outcome_all = np.array(control_data_all[outcome_var]).reshape(n_controls, periods_all).T #All outcomes
-        
-        #Only pre-treatment
-        control_data = control_data_all.loc[dataset[time_var] < treatment_period]
-        #Extract outcome, then shape as matrix
-        control_outcome = np.array(control_data[outcome_var]).reshape(n_controls, periods_pre_treatment).T
-        
-        #Extract the covariates for all the control units
-        #Identify which rows correspond to which control unit by setting index,
-        #then take the unitwise mean of each covariate
-        #This results in the desired (n_control x n_covariates) matrix
-        control_covariates = np.array(control_data[covariates].\
-                set_index(np.arange(len(control_data[covariates])) // periods_pre_treatment).groupby(level=-1).mean()).T
+        control_outcome_all = np.delete(outcome, treated_row, axis=0).T
+        control_outcome = control_outcome_all[:periods_pre_treatment]
 
-        return control_outcome_all, control_outcome, control_covariates
+        return treated_outcome_all, treated_outcome, control_outcome_all, control_outcome
+
+    def _process_covariate_data(self, covariate_values, treated_row, periods_pre_treatment):
+        '''
+        Extracts and formats covariate matrices for the treated unit and the control group
+        from the (n_units x n_periods x n_covariates) covariate array returned by _build_panel
+
+        Returns the unitwise mean of each covariate in the pre-treatment period,
+        a (n_covariates x 1) matrix for the treated unit and a (n_covariates x n_controls) matrix for the controls
+        '''
+        #Unitwise mean of each covariate over the pre-treatment periods, ignoring missing values
+        values = covariate_values[:, :periods_pre_treatment]
+        observed = ~np.isnan(values)
+        #Counted in the values' dtype, as an integer count would promote float32 means to float64
+        with np.errstate(invalid='ignore', divide='ignore'):
+            covariate_means = np.where(observed, values, 0).sum(axis=1) / observed.sum(axis=1, dtype=values.dtype)
+
+        treated_covariates = covariate_means[treated_row].reshape(-1, 1).copy()
+        control_covariates = np.delete(covariate_means, treated_row, axis=0).T
+
+        return treated_covariates, control_covariates
 
     def _rescale_covariate_variance(self, treated_covariates, control_covariates, n_covariates):
         '''Rescale covariates to be unit variance'''
@@ -287,12 +456,12 @@ class Synth(DataProcessor, Optimize, Plot, Tables, ValidityTests):
                 outcome_var, id_var, time_var, 
                 treatment_period, treated_unit, 
                 n_optim=10, pen=0, exclude_columns=[], random_seed=0,
-                **kwargs):
+                dtype=np.float64, **kwargs):
         '''
         data: 
           Type: Pandas dataframe. 
           A pandas dataframe containing the dataset. Each row should contain one observation for a unit at a time, 
-          including the outcome and covariates. Dataset should be ordered by unit then time.
+          including the outcome and covariates. Dataset should be ordered by unit then time, otherwise it is sorted once before processing.
 
         outcome_var: 
           Type: str. 
@@ -326,19 +495,47 @@ class Synth(DataProcessor, Optimize, Plot, Tables, ValidityTests):
           Penalization coefficient which determines the relative importance of minimizing the sum of the pairwise difference of each individual
           control unit in the synthetic control and the treated unit, vis-a-vis the difference between the synthetic control and the treated unit.
           Higher number means pairwise difference matters more.
+
+        dtype:
+          Type: numpy dtype. Default: np.float64.
+          Precision of the outcome and covariate matrices used in optimization.
+          np.float32 halves memory use, and the optimizer tolerance is loosened accordingly,
+          so results may differ slightly from the default.
         
         '''
-        self.method = "SC"
-
         original_checked_input = self._process_input_data(
             dataset, outcome_var, id_var, time_var, treatment_period, treated_unit, pen, 
-            exclude_columns, random_seed, **kwargs
+            exclude_columns, random_seed, dtype, **kwargs
         )
+        self._fit(original_checked_input, pen, n_optim)
+
+    @classmethod
+    def _prepare_placebos(cls, dataset, outcome_var, id_var, time_var,
+                          exclude_columns=[], dtype=np.float64, **kwargs):
+        '''Reshapes dataset once into the inputs shared by every fit in fit_placebos'''
+        covariates = cls._get_covariates(dataset, id_var, time_var, exclude_columns)
+        return covariates, cls._build_panel(dataset, outcome_var, id_var, time_var, covariates, dtype)
+
+    @classmethod
+    def _fit_placebo(cls, shared, outcome_var, id_var, time_var, treatment_period, treated_unit,
+                     n_optim=10, pen=0, random_seed=0, dtype=np.float64, **kwargs):
+        '''Fits a synthetic control from the output of _prepare_placebos, without the dataset'''
+        covariates, panel = shared
+        fit = cls.__new__(cls)
+        original_checked_input = fit._process_panel(panel, covariates, outcome_var, id_var, time_var,
+                                                    treatment_period, treated_unit, pen, random_seed, dtype)
+        fit._fit(original_checked_input, pen, n_optim)
+        return fit
+
+    def _fit(self, original_checked_input, pen, n_optim):
+        '''Finds the synthetic control for the processed input data and prepares the summary tables'''
+        self.method = "SC"
         self.original_data = SynthBase(**original_checked_input)
 
         #Get synthetic Control
-        self.optimize(self.original_data.treated_outcome, self.original_data.treated_covariates,
-                    self.original_data.control_outcome, self.original_data.control_covariates,
+        matrices = self.original_data.matrices
+        self.optimize(matrices.Z1, matrices.X1,
+                    matrices.Z0, matrices.X0,
                     self.original_data.pairwise_difference,
                     self.original_data, False, pen, n_optim)
         
@@ -358,13 +555,12 @@ class DiffSynth(DataProcessor, Optimize, Plot, Tables, ValidityTests):
                 treatment_period, treated_unit, 
                 n_optim=10, pen=0, 
                 exclude_columns=[], random_seed=0,
-                not_diff_cols=None,
-                **kwargs):
+                not_diff_cols=None, dtype=np.float64, **kwargs):
         '''
         data: 
           Type: Pandas dataframe. 
           A pandas dataframe containing the dataset. Each row should contain one observation for a unit at a time, 
-          including the outcome and covariates. Dataset should be ordered by unit then time.
+          including the outcome and covariates. Dataset should be ordered by unit then time, otherwise it is sorted once before processing.
 
         outcome_var: 
           Type: str. 
@@ -404,28 +600,63 @@ class DiffSynth(DataProcessor, Optimize, Plot, Tables, ValidityTests):
          Penalization coefficient which determines the relative importance of minimizing the sum of the pairwise difference of each individual
          control unit in the synthetic control and the treated unit, vis-a-vis the difference between the synthetic control and the treated unit.
          Higher number means pairwise difference matters more.
-        '''
-        self.method = "DSC"
 
+        dtype:
+         Type: numpy dtype. Default: np.float64.
+         Precision of the outcome and covariate matrices used in optimization.
+         np.float32 halves memory use, and the optimizer tolerance is loosened accordingly,
+         so results may differ slightly from the default.
+        '''
         #Process original data - will be used in plotting and summary
         original_checked_input = self._process_input_data(
             dataset, outcome_var, id_var, time_var, treatment_period, treated_unit, pen, 
-            exclude_columns, random_seed, **kwargs
+            exclude_columns, random_seed, dtype, **kwargs
         )
-        self.original_data = SynthBase(**original_checked_input)
 
         #Process differenced data - will be used in inference and optimization
-        modified_dataset = self.difference_data(dataset, not_diff_cols)
+        modified_dataset = self._difference_dataset(dataset, outcome_var, id_var, time_var,
+                                                    original_checked_input['covariates'], not_diff_cols)
         modified_checked_input = self._process_input_data(
             modified_dataset, outcome_var, id_var, time_var, treatment_period, treated_unit, pen, 
-            exclude_columns, random_seed, **kwargs
+            exclude_columns, random_seed, dtype, **kwargs
         )
+        self._fit(original_checked_input, modified_checked_input, not_diff_cols, pen, n_optim)
+
+    @classmethod
+    def _prepare_placebos(cls, dataset, outcome_var, id_var, time_var,
+                          exclude_columns=[], not_diff_cols=None, dtype=np.float64, **kwargs):
+        '''Reshapes dataset and its differenced version once into the inputs shared by every fit in fit_placebos'''
+        covariates = cls._get_covariates(dataset, id_var, time_var, exclude_columns)
+        modified_dataset = cls._difference_dataset(dataset, outcome_var, id_var, time_var, covariates, not_diff_cols)
+        return (covariates,
+                cls._build_panel(dataset, outcome_var, id_var, time_var, covariates, dtype),
+                cls._build_panel(modified_dataset, outcome_var, id_var, time_var, covariates, dtype))
+
+    @classmethod
+    def _fit_placebo(cls, shared, outcome_var, id_var, time_var, treatment_period, treated_unit,
+                     n_optim=10, pen=0, random_seed=0, not_diff_cols=None, dtype=np.float64, **kwargs):
+        '''Fits a differenced synthetic control from the output of _prepare_placebos, without the dataset'''
+        covariates, panel, modified_panel = shared
+        fit = cls.__new__(cls)
+        original_checked_input = fit._process_panel(panel, covariates, outcome_var, id_var, time_var,
+                                                    treatment_period, treated_unit, pen, random_seed, dtype)
+        modified_checked_input = fit._process_panel(modified_panel, covariates, outcome_var, id_var, time_var,
+                                                    treatment_period, treated_unit, pen, random_seed, dtype)
+        fit._fit(original_checked_input, modified_checked_input, not_diff_cols, pen, n_optim)
+        return fit
+
+    def _fit(self, original_checked_input, modified_checked_input, not_diff_cols, pen, n_optim):
+        '''Finds the synthetic control for the processed differenced data and prepares the summary tables'''
+        self.method = "DSC"
+        self.not_diff_cols = not_diff_cols #The differenced dataset is not kept, in_time_placebo derives it again
+        self.original_data = SynthBase(**original_checked_input)
         self.modified_data = SynthBase(**modified_checked_input)
         self.modified_data.pairwise_difference = self.original_data.pairwise_difference 
 
         #Get synthetic Control
-        self.optimize(self.modified_data.treated_outcome, self.modified_data.treated_covariates,
-                    self.modified_data.control_outcome, self.modified_data.control_covariates,
+        matrices = self.modified_data.matrices
+        self.optimize(matrices.Z1, matrices.X1,
+                    matrices.Z0, matrices.X0,
                     self.modified_data.pairwise_difference,
                     self.modified_data, False, pen, n_optim)
         
@@ -450,21 +681,26 @@ class DiffSynth(DataProcessor, Optimize, Plot, Tables, ValidityTests):
         1. Imputes missing values using linear interpolation. 
            An important step because the first difference is undefined if two consecutive periods are not present.
         '''
+        data = self.original_data
+        return self._difference_dataset(dataset, data.outcome_var, data.id, data.time, data.covariates, not_diff_cols)
+
+    @staticmethod
+    def _difference_dataset(dataset, outcome_var, id_var, time_var, covariates, not_diff_cols):
+        '''Implements difference_data, taking the column names explicitly so that no fitted data is needed'''
         #Make deepcopy of original data as base
         modified_dataset = copy.deepcopy(dataset)
-        data = self.original_data
 
         #Binary flag for whether there are columns to ignore
         ignore_all_cols = not_diff_cols == None
 
         #Compute difference of outcome variable
-        modified_dataset[data.outcome_var] = modified_dataset.groupby(data.id)[data.outcome_var].apply(
+        modified_dataset[outcome_var] = modified_dataset.groupby(id_var)[outcome_var].apply(
                                             lambda unit: unit.interpolate(method='linear', limit_direction="both")).diff()
         
         #For covariates
-        for col in data.covariates:
+        for col in covariates:
             #Fill in missing values using unitwise linear interpolation
-            modified_dataset[col] = modified_dataset.groupby(data.id)[col].apply(
+            modified_dataset[col] = modified_dataset.groupby(id_var)[col].apply(
                                     lambda unit: unit.interpolate(method='linear', limit_direction="both"))
             
             #Compute change from previous period
@@ -473,11 +709,11 @@ class DiffSynth(DataProcessor, Optimize, Plot, Tables, ValidityTests):
                     modified_dataset[col].diff()
 
         #Drop first time period for every unit as the change from the previous period is undefined
-        modified_dataset.drop(modified_dataset.loc[modified_dataset[data.time]==modified_dataset[data.time].min()].index, inplace=True)
+        modified_dataset.drop(modified_dataset.loc[modified_dataset[time_var]==modified_dataset[time_var].min()].index, inplace=True)
         #Return resulting dataframe
         return modified_dataset
     
-    def demean_data(self):
+    def demean_data(self, dataset):
         '''
         Takes an appropriately formatted, unprocessed dataset
         returns dataset with demeaned values computed unitwise for the outcome and all covariates
@@ -486,7 +722,20 @@ class DiffSynth(DataProcessor, Optimize, Plot, Tables, ValidityTests):
         Transformation method - MeanSubtraction: 
         Subtracting the mean of the corresponding variable and unit from every observation
         '''
-        raise NotImplementedError
-        
-        mean_subtract_cols = self.dataset.groupby(self.id).apply(lambda x: x - np.mean(x)).drop(columns=[self.time], axis=1)
-        return pd.concat([data[["ID", "Time"]], mean_subtract_cols], axis=1)
+        data = self.original_data
+        dataset = self._sort_panel(dataset, data.id, data.time)
+
+        #Only the outcome and covariates are demeaned, excluded columns are dropped before any work is done
+        num_cols = data.covariates
+        values = dataset[num_cols].to_numpy(dtype=np.float64, copy=True)
+
+        #Dataset is sorted on ID then Time, so each unit is a contiguous block of rows
+        ids = dataset[data.id].to_numpy()
+        unit_starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+
+        mean_subtract_values = _demean_sorted(values, unit_starts)
+
+        #Assemble the result in a single DataFrame construction
+        columns = {data.id: dataset[data.id].to_numpy(), data.time: dataset[data.time].to_numpy()}
+        columns.update((col, mean_subtract_values[:, i]) for i, col in enumerate(num_cols))
+        return pd.DataFrame(columns, index=dataset.index)
@@ -69,10 +69,16 @@ class Optimize(object):
         verbose: bool, default=False
             If true, prints additional detail regarding the state of the optimization
         '''
+        #The squared pairwise differences do not depend on v, so compute them once for all iterations
+        squared_pairwise_difference = np.square(pairwise_difference)
+
         args = (treated_outcome, treated_covariates,
                 control_outcome, control_covariates,
-                pairwise_difference,
+                squared_pairwise_difference,
                 pen, placebo, data)
+
+        #Single precision data cannot be optimized to the same tolerance as double precision
+        gtol = 1e-8 if np.dtype(data.dtype) == np.float64 else 1e-7
         
         for step in range(steps):
 
@@ -102,7 +108,7 @@ class Optimize(object):
             #Optimze
             res = minimize(self.total_loss, v_0,  args=(args),
                             method='L-BFGS-B', bounds=bnds, 
-                            options={'gtol': 1e-8,'disp':3, 'iprint':3})
+                            options={'gtol': gtol,'disp':3, 'iprint':3})
             
             if verbose:
                 print("Successful:", res.success)
@@ -124,12 +130,15 @@ class Optimize(object):
     def total_loss(self, v_0, 
                     treated_outcome, treated_covariates,
                     control_outcome, control_covariates, 
-                    pairwise_difference,
+                    squared_pairwise_difference,
                     pen, placebo, data):
         '''
         Solves for w*(v) that minimizes loss function 1 given v,
         Returns loss from loss function 2 with w=w*(v)
 
+        squared_pairwise_difference: np.array
+            Elementwise square of the pairwise difference matrix (n_covariates x n_controls)
+
         placebo: bool
             indicates whether the optimization is ran for finding the real synthetic control
             or as part of a placebo-style validity test. If True, only placebo class attributes are affected.
@@ -159,7 +168,8 @@ class Optimize(object):
         else:
             treated_synth_difference = cvx.sum(V @ cvx.square(treated_covariates.T - control_covariates @ w))
         
-        pairwise_difference = cvx.sum(V @ (cvx.square(pairwise_difference) @ w))
+        #sum(V @ squared_pairwise_difference @ w) for diagonal V, reduced to a linear term in w before handing it to cvxpy
+        pairwise_difference = cvx.sum((np.diagonal(V) @ squared_pairwise_difference) @ w)
         objective = cvx.Minimize(treated_synth_difference + pen_coef*pairwise_difference)
 
         #Add constraint sum of weights must equal one
@@ -182,7 +192,7 @@ class Optimize(object):
                 data.v = np.diagonal(V) / np.sum(np.diagonal(V)) #Make sure its normailzed (sometimes the optimizers diverge from bounds)
                 data.pen = pen_coef
                 data.synth_outcome = data.w.T @ data.control_outcome_all.T #Transpose to make it (n_periods x 1)
-                data.synth_covariates = data.control_covariates @ data.w
+                data.synth_covariates = data.matrices.X0 @ data.w
 
         elif placebo == "in-space":
             data.in_space_placebo_w = w.value
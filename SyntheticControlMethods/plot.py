@@ -88,7 +88,7 @@ class Plot(object):
 
         #Extract Synthetic Control
         synth = data.synth_outcome
-        time = data.dataset[data.time].unique()
+        time = data.times
 
         plt = self._get_plotter()
         fig = plt.figure(figsize=figsize)
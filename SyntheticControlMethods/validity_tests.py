@@ -12,12 +12,52 @@
 
 from __future__ import absolute_import, division, print_function
 
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
 import pandas as pd
 
+#Arguments shared by every placebo fit in a worker process, set once per worker by _init_placebo_worker
+_placebo_args = None
+
+def _init_placebo_worker(cls, shared, args, kwargs):
+    '''Stores the shared fitting arguments, so the reshaped data is sent to each worker once rather than once per unit'''
+    global _placebo_args
+    _placebo_args = (cls, shared, args, kwargs)
+
+def _fit_placebo(unit):
+    '''Fits a synthetic control treating unit as the treated unit'''
+    cls, shared, args, kwargs = _placebo_args
+    return cls._fit_placebo(shared, *args, unit, **kwargs)
+
 class ValidityTests(object):
     '''This class is responsible for validity tests for evaluating synthetic controls.'''
 
+    @classmethod
+    def fit_placebos(cls, dataset, outcome_var, id_var, time_var, treatment_period, units, n_jobs=None, **kwargs):
+        '''
+        Fits a separate synthetic control for each unit in units, treating it as the treated unit.
+        The fits are independent, so they are run in parallel across processes.
+
+        n_jobs: int. Default: None.
+            Number of worker processes. If None, uses the number of processors on the machine.
+
+        Remaining keyword arguments, e.g. n_optim or pen, are passed on to the constructor.
+
+        The dataset is reshaped once here and only the resulting arrays are sent to the workers.
+        The returned objects therefore have no dataset: accessing it raises a ReferenceError,
+        and so does in_time_placebo, which needs it. Refit a unit with the constructor to run one.
+
+        Returns:
+            list of fitted objects, in the same order as units
+        '''
+        shared = cls._prepare_placebos(dataset, outcome_var, id_var, time_var, **kwargs)
+
+        args = (outcome_var, id_var, time_var, treatment_period)
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_placebo_worker,
+                                 initargs=(cls, shared, args, kwargs)) as executor:
+            return list(executor.map(_fit_placebo, units))
+
     def in_space_placebo(self, n_optim=3):
         '''
         Fits a synthetic control to each of the control units, 
@@ -34,15 +74,17 @@ class ValidityTests(object):
         #See which instance of SynthData to use depending on if we are using DiffSynth or Synth
         data = self.original_data if self.method=='SC' else self.modified_data
 
+        control_covariates = data.matrices.X0
+
         placebo_outcomes = []
         for i in range(data.n_controls):
             #Format placebo and control data
             treated_placebo_outcome = data.control_outcome_all[:,i].reshape(data.periods_all, 1)
 
-            treated_placebo_covariates = data.control_covariates[:,i].reshape(data.n_covariates, 1)
+            treated_placebo_covariates = control_covariates[:,i].reshape(data.n_covariates, 1)
 
-            control_placebo_outcome = np.array([data.control_outcome_all[:,j] for j in range(data.n_controls) if j != i]).T
-            control_placebo_covariates = np.array([[data.control_covariates[x,j] for j in range(data.n_controls) if j != i] for x in range(data.n_covariates)])
+            control_placebo_outcome = np.delete(data.control_outcome_all, i, axis=1)
+            control_placebo_covariates = np.delete(control_covariates, i, axis=1)
 
             #Rescale covariates to be unit variance (helps with optimization)
             treated_placebo_covariates, control_placebo_covariates = self._rescale_covariate_variance(treated_placebo_covariates,
@@ -95,21 +137,27 @@ class ValidityTests(object):
         '''
         data = self.original_data if self.method=='SC' else self.modified_data
 
-        periods_pre_treatment = data.dataset.loc[data.dataset[data.time]<placebo_treatment_period][data.time].nunique()
+        #Covariate means are recomputed from the dataset, which raises a ReferenceError if it is no longer available
+        if self.method == 'SC':
+            dataset = data.dataset
+        else:
+            dataset = self.difference_data(self.original_data.dataset, self.not_diff_cols)
+        units, _, _, covariate_values = self._build_panel(dataset, data.outcome_var, data.id, data.time,
+                                                          data.covariates, data.dtype)
+        if not np.array_equal(units, data.units):
+            raise ValueError("The units in the dataset have changed since fitting, refit to run an in-time placebo")
 
         #Format necessary matrices, but do so with the new, earlier treatment period
-        ###Get treated unit matrices first###
-        in_time_placebo_treated_outcome_all, in_time_placebo_treated_outcome, in_time_placebo_treated_covariates = self._process_treated_data(
-            data.dataset, data.outcome_var, data.id, data.time, 
-            placebo_treatment_period, data.treated_unit, data.periods_all, 
-            periods_pre_treatment, data.covariates, data.n_covariates
-        )
+        periods_pre_treatment = int(pd.Index(data.times).searchsorted(placebo_treatment_period))
+
+        #Outcomes for all periods are unchanged, only the pre-treatment cut-off moves
+        in_time_placebo_treated_outcome_all = data.treated_outcome_all
+        in_time_placebo_control_outcome_all = data.control_outcome_all
+        in_time_placebo_treated_outcome = in_time_placebo_treated_outcome_all[:periods_pre_treatment]
+        in_time_placebo_control_outcome = in_time_placebo_control_outcome_all[:periods_pre_treatment]
 
-        ### Now for control unit matrices ###
-        in_time_placebo_control_outcome_all, in_time_placebo_control_outcome, in_time_placebo_control_covariates = self._process_control_data(
-            data.dataset, data.outcome_var, data.id, data.time, 
-            placebo_treatment_period, data.treated_unit, data.n_controls, 
-            data.periods_all, periods_pre_treatment, data.covariates
+        in_time_placebo_treated_covariates, in_time_placebo_control_covariates = self._process_covariate_data(
+            covariate_values, data.treated_row, periods_pre_treatment
         )
 
         pairwise_difference = in_time_placebo_treated_covariates - in_time_placebo_control_covariates
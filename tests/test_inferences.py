@@ -18,7 +18,7 @@ import numpy as np
 import pandas as pd
 import unittest
 
-from synth.inferences import Inferences
+from SyntheticControlMethods.validity_tests import ValidityTests
 
 class TestValidityInferences(unittest.TestCase):
 
@@ -10,4 +10,170 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-#Will add tests here
\ No newline at end of file
+from __future__ import absolute_import, division, print_function
+
+import os
+import pickle
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from SyntheticControlMethods import Synth, DiffSynth
+from SyntheticControlMethods.main import DataProcessor, SynthBase
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), '..', 'examples', 'datasets', 'german_reunification.csv')
+COUNTRIES = ["West Germany", "USA", "Japan", "France", "Italy", "Austria"]
+ARGS = ("gdp", "country", "year", 1990)
+FIT_KWARGS = dict(n_optim=1, pen=0, exclude_columns=["code"])
+
+
+def load_data():
+    '''Small subset of the german reunification dataset, sorted on ID then Time'''
+    data = pd.read_csv(DATA_PATH)
+    return data.loc[data["country"].isin(COUNTRIES)].reset_index(drop=True)
+
+
+def process(dataset, treated_unit="West Germany", treatment_period=1990):
+    return DataProcessor()._process_input_data(dataset, "gdp", "country", "year", treatment_period,
+                                               treated_unit, 0, ["code"], 0)
+
+
+class TestDataProcessing(unittest.TestCase):
+
+    def test_outcome_matrices_match_pivot(self):
+        data = load_data()
+        processed = process(data)
+        outcome = data.pivot(index="year", columns="country", values="gdp")
+
+        np.testing.assert_allclose(processed['treated_outcome_all'], outcome[["West Germany"]])
+        np.testing.assert_allclose(processed['control_outcome_all'], outcome[list(processed['control_units'])])
+        np.testing.assert_allclose(processed['treated_outcome'], outcome.loc[outcome.index < 1990, ["West Germany"]])
+
+    def test_shuffled_dataset_gives_same_matrices(self):
+        data = load_data()
+        shuffled = data.sample(frac=1, random_state=0)
+        expected, result = process(data), process(shuffled)
+
+        #Units keep their order of first appearance, so align control columns by unit
+        self.assertEqual(sorted(expected['control_units']), sorted(result['control_units']))
+        position = {unit: i for i, unit in enumerate(expected['control_units'])}
+        order = [position[unit] for unit in result['control_units']]
+
+        np.testing.assert_allclose(result['treated_outcome_all'], expected['treated_outcome_all'])
+        np.testing.assert_allclose(result['unscaled_treated_covariates'], expected['unscaled_treated_covariates'])
+        np.testing.assert_allclose(result['control_outcome_all'], expected['control_outcome_all'][:, order])
+        np.testing.assert_allclose(result['unscaled_control_covariates'], expected['unscaled_control_covariates'][:, order])
+
+    def test_unbalanced_panel(self):
+        data = load_data()
+        #A duplicated row, and a duplicate in place of another period, both break the one row per unit and period layout
+        duplicated = pd.concat([data, data.iloc[[5]]])
+        replaced = data.copy()
+        replaced.loc[5, "year"] = replaced.loc[4, "year"]
+        for dataset in [duplicated, replaced, data.drop(index=5)]:
+            with self.assertRaisesRegex(ValueError, "exactly one row"):
+                process(dataset)
+
+    def test_refit_after_editing_frame(self):
+        data = load_data()
+        first = process(data)
+
+        data["gdp"] = data["gdp"] * 2
+        doubled = process(data)
+        np.testing.assert_allclose(doubled['treated_outcome'], 2 * first['treated_outcome'])
+
+        data.loc[data["country"] == "USA", "gdp"] = 0
+        zeroed = process(data)
+        usa = list(zeroed['control_units']).index("USA")
+        np.testing.assert_array_equal(zeroed['control_outcome'][:, usa], 0)
+
+    def test_panel_must_match_covariates_and_dtype(self):
+        data = load_data()
+        processor = DataProcessor()
+        covariates = processor._get_covariates(data, "country", "year", ["code"])
+        panel = processor._build_panel(data, "gdp", "country", "year", covariates, np.float32)
+
+        for panel_covariates, dtype in [(covariates, np.float64), (covariates[1:], np.float32)]:
+            with self.assertRaises(ValueError):
+                processor._process_panel(panel, panel_covariates, "gdp", "country", "year", 1990,
+                                         "West Germany", 0, 0, dtype)
+
+    def test_covariate_means_match_groupby(self):
+        data = load_data()
+        processed = process(data)
+        covariates = processed['covariates']
+        #pandas skips missing values, as the 3-D reduction does
+        means = data.loc[data["year"] < 1990].groupby("country")[covariates].mean()
+
+        np.testing.assert_allclose(processed['unscaled_treated_covariates'], means.loc[["West Germany"]].T)
+        np.testing.assert_allclose(processed['unscaled_control_covariates'], means.loc[list(processed['control_units'])].T)
+
+    def test_datetime_time_with_string_treatment_period(self):
+        data = load_data()
+        data["year"] = pd.to_datetime(data["year"].astype(str))
+        processed = process(data, treatment_period="1990-01-01")
+        self.assertEqual(processed['periods_pre_treatment'], 30)
+        self.assertEqual(processed['treated_outcome'].shape, (30, 1))
+
+    def test_unknown_treated_unit(self):
+        with self.assertRaisesRegex(ValueError, "Atlantis"):
+            process(load_data(), treated_unit="Atlantis")
+
+    def test_demean_data(self):
+        data = load_data()
+        dsc = DiffSynth.__new__(DiffSynth)
+        dsc.original_data = SynthBase(**process(data))
+
+        result = dsc.demean_data(data)
+        covariates = dsc.original_data.covariates
+        means = data.groupby("country")[covariates].transform('mean')
+        np.testing.assert_allclose(result[covariates], data[covariates] - means)
+        self.assertEqual(list(result.columns[:2]), ["country", "year"])
+
+
+
+class TestSynth(unittest.TestCase):
+
+    def test_float32_keeps_dtype_and_fit(self):
+        data = load_data()
+        sc64 = Synth(data, *ARGS, "West Germany", **FIT_KWARGS)
+        sc32 = Synth(data, *ARGS, "West Germany", dtype=np.float32, **FIT_KWARGS)
+
+        for name in ['treated_outcome', 'control_outcome', 'treated_outcome_all', 'control_outcome_all',
+                     'treated_covariates', 'control_covariates', 'unscaled_treated_covariates',
+                     'unscaled_control_covariates', 'pairwise_difference']:
+            self.assertEqual(getattr(sc32.original_data, name).dtype, np.float32, name)
+        #The loss is flat near the optimum, so single precision can settle on somewhat different weights,
+        #but the fit itself should be as good and the synthetic outcome nearly the same
+        np.testing.assert_allclose(sc32.original_data.min_loss, sc64.original_data.min_loss, rtol=1e-2)
+        np.testing.assert_allclose(sc32.original_data.synth_outcome, sc64.original_data.synth_outcome, rtol=1e-2)
+
+    def test_fit_placebos_matches_serial_fits(self):
+        data = load_data()
+        units = ["Japan", "USA", "France"]
+        fits = Synth.fit_placebos(data, *ARGS, units, n_jobs=2, **FIT_KWARGS)
+
+        self.assertEqual([fit.original_data.treated_unit for fit in fits], units)
+        for unit, fit in zip(units, fits):
+            serial = Synth(data, *ARGS, unit, **FIT_KWARGS)
+            np.testing.assert_allclose(fit.original_data.w, serial.original_data.w, atol=1e-4)
+            np.testing.assert_allclose(fit.original_data.synth_outcome, serial.original_data.synth_outcome, rtol=1e-4)
+            with self.assertRaises(ReferenceError):
+                fit.original_data.dataset
+
+    def test_pickled_result_drops_dataset(self):
+        data = load_data()
+        sc = Synth(data, *ARGS, "West Germany", **FIT_KWARGS)
+        self.assertIs(sc.original_data.dataset, data)
+        sc.in_time_placebo(1985, n_optim=1)
+
+        restored = pickle.loads(pickle.dumps(sc))
+        np.testing.assert_allclose(restored.original_data.w, sc.original_data.w)
+        with self.assertRaises(ReferenceError):
+            restored.original_data.dataset
+        with self.assertRaises(ReferenceError):
+            restored.in_time_placebo(1985, n_optim=1)
+
+if __name__ == '__main__':
+    unittest.main()